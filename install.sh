@@ -120,6 +120,15 @@ chmod +x "$SCRIPT_DIR/scripts/stats.py"
 echo -e "  ${GREEN}✓${NC} Installing Python dependencies..."
 uv sync --project "$SCRIPT_DIR"
 
+# Compile the parsing core with mypyc (optional, pure Python is used otherwise)
+rm -f "$SCRIPT_DIR"/scripts/stats_core.*.so
+if (cd "$SCRIPT_DIR/scripts" && uv run --project "$SCRIPT_DIR" --with mypy mypyc stats_core.py) &>/dev/null; then
+    echo -e "  ${GREEN}✓${NC} Compiled stats_core with mypyc"
+else
+    rm -f "$SCRIPT_DIR"/scripts/stats_core.*.so
+    echo -e "  ${YELLOW}!${NC} mypyc build skipped, using pure Python"
+fi
+
 # Step 5: Start services
 echo ""
 echo -e "${CYAN}[5/5] Starting services...${NC}"
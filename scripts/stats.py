@@ -11,13 +11,16 @@ Commands:
     cci stats tail         # Watch for new metrics (live)
 """
 
-import json
+import atexit
+import mmap
 import sqlite3
 import os
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
-from glob import glob
 
 from rich.console import Console
 from rich.table import Table
@@ -25,13 +28,56 @@ from rich.panel import Panel
 from rich.text import Text
 from rich import box
 
+from stats_core import json_loads, parse_line
+
 console = Console()
 
+# Connection shared by sync and stats within one process (see get_conn)
+_conn = None
+
 # Data directory (configurable via environment)
 DATA_DIR = Path(os.environ.get("CC_INSIGHTS_DATA_DIR", Path.home() / ".claude" / "cc-insights"))
 RAW_DIR = DATA_DIR / "raw"
 FAILED_DIR = DATA_DIR / "failed"
 DB_PATH = DATA_DIR / "metrics.db"
+# raw/ directory signature as of the last completed sync
+SYNC_MARKER_PATH = DATA_DIR / ".last-sync"
+
+# Bump with each new upgrade step in migrate_db()
+SCHEMA_VERSION = 3
+
+# Rows buffered per executemany() call during sync
+SYNC_BATCH_SIZE = 1000
+
+# Threads parsing changed JSONL files concurrently during sync
+SYNC_WORKERS = min(4, os.cpu_count() or 1)
+
+# Unsynced tails at least this large are scanned through mmap
+MMAP_MIN_BYTES = 4 << 20
+
+# Sync statements, built once so every call reuses the same cached prepared statement
+INSERT_METRICS_SQL = """
+    INSERT INTO metrics (timestamp, date, model, input_tokens, output_tokens,
+                         cache_read_tokens, cache_creation_tokens, total_tokens, raw_data)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+UPSERT_DAILY_TOTALS_SQL = """
+    INSERT INTO daily_totals (date, request_count, input_tokens, output_tokens,
+                              cache_read_tokens, cache_creation_tokens, total_tokens)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        request_count = request_count + excluded.request_count,
+        input_tokens = input_tokens + excluded.input_tokens,
+        output_tokens = output_tokens + excluded.output_tokens,
+        cache_read_tokens = cache_read_tokens + excluded.cache_read_tokens,
+        cache_creation_tokens = cache_creation_tokens + excluded.cache_creation_tokens,
+        total_tokens = total_tokens + excluded.total_tokens
+"""
+SELECT_SYNC_STATE_SQL = "SELECT file_path, last_line, last_offset, mtime_ns, size FROM sync_state"
+UPSERT_SYNC_STATE_SQL = """
+    INSERT OR REPLACE INTO sync_state (file_path, last_line, last_offset, mtime_ns, size, synced_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
 
 # Multi-model pricing (per 1M tokens)
 MODEL_PRICING = {
@@ -45,7 +91,12 @@ MODEL_PRICING = {
 }
 DEFAULT_PRICING = {"input": 15, "output": 75, "cache_read": 1.875, "cache_write": 18.75}
 
+# Pre-rendered bars, indexed by filled length (model share / peak hours)
+SHARE_BARS = tuple("█" * i + "░" * (12 - i) for i in range(13))
+HOUR_BARS = tuple("█" * i for i in range(25))
+
 
+@lru_cache(maxsize=256)
 def get_pricing(model: str | None) -> dict:
     """Get pricing for a model, with fuzzy matching."""
     if not model:
@@ -61,9 +112,59 @@ def get_pricing(model: str | None) -> dict:
     return DEFAULT_PRICING
 
 
+def pricing_case(key: str) -> str:
+    """SQL CASE on `model` selecting the same rate get_pricing(model)[key] does."""
+    whens = [f"WHEN model = '{name}' THEN {pricing[key]!r}" for name, pricing in MODEL_PRICING.items()]
+    whens += [f"WHEN instr(lower(model), '{keyword}') THEN {MODEL_PRICING[keyword][key]!r}"
+              for keyword in ("opus", "sonnet", "haiku")]
+    return f"CASE {' '.join(whens)} ELSE {DEFAULT_PRICING[key]!r} END"
+
+
+# Per-model cost of a GROUP BY model row, computed by SQLite (see compute_cost)
+MODEL_COST_SQL = f"""(
+    COALESCE(SUM(input_tokens), 0) / 1000000.0 * {pricing_case("input")}
+    + COALESCE(SUM(output_tokens), 0) / 1000000.0 * {pricing_case("output")}
+    + COALESCE(SUM(cache_read_tokens), 0) / 1000000.0 * {pricing_case("cache_read")}
+    + COALESCE(SUM(cache_creation_tokens), 0) / 1000000.0 * {pricing_case("cache_write")}
+)"""
+
+
 def init_db():
     """Initialize SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
+    # Autocommit mode: sync and migrate_db() issue their own BEGIN/COMMIT
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    # WAL + relaxed sync: one fsync per checkpoint instead of per commit
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        migrate_db(conn, version)
+    return conn
+
+
+def get_conn():
+    """Return the process-wide connection, opening it on first use."""
+    global _conn
+    if _conn is None:
+        _conn = init_db()
+        atexit.register(_conn.close)
+    return _conn
+
+
+def add_column(conn, table: str, column: str, decl: str):
+    """Add a column unless the table already has it."""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def migrate_db(conn, version: int):
+    """Bring the schema from user_version `version` up to SCHEMA_VERSION."""
+    # All upgrade steps apply atomically, with the write lock held from the start
+    conn.execute("BEGIN IMMEDIATE")
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
     conn.execute("""
         CREATE TABLE IF NOT EXISTS metrics (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -76,148 +177,155 @@ def init_db():
             cache_creation_tokens INTEGER DEFAULT 0,
             total_tokens INTEGER DEFAULT 0,
             request_count INTEGER DEFAULT 1,
-            raw_data TEXT,
+            raw_data BLOB,
             synced_at TEXT DEFAULT CURRENT_TIMESTAMP
         )
     """)
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_date ON metrics(date)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_model ON metrics(model)")
     conn.execute("""
         CREATE TABLE IF NOT EXISTS sync_state (
             file_path TEXT PRIMARY KEY,
             last_line INTEGER DEFAULT 0,
+            last_offset INTEGER,
+            mtime_ns INTEGER,
+            size INTEGER,
             synced_at TEXT DEFAULT CURRENT_TIMESTAMP
         )
     """)
-    # Migration: add cache columns if missing
-    for col in ["cache_read_tokens", "cache_creation_tokens"]:
-        try:
-            conn.execute(f"ALTER TABLE metrics ADD COLUMN {col} INTEGER DEFAULT 0")
-        except sqlite3.OperationalError:
-            pass
-    conn.commit()
-    return conn
+    # Per-day rollup maintained by sync, so period totals read O(days) rows
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            date TEXT PRIMARY KEY,
+            request_count INTEGER DEFAULT 0,
+            input_tokens INTEGER DEFAULT 0,
+            output_tokens INTEGER DEFAULT 0,
+            cache_read_tokens INTEGER DEFAULT 0,
+            cache_creation_tokens INTEGER DEFAULT 0,
+            total_tokens INTEGER DEFAULT 0
+        )
+    """)
+
+    # Upgrade tables created by older versions; fresh databases skip this
+    if "metrics" in existing:
+        if version < 1:
+            add_column(conn, "metrics", "cache_read_tokens", "INTEGER DEFAULT 0")
+            add_column(conn, "metrics", "cache_creation_tokens", "INTEGER DEFAULT 0")
+            # Resume by byte offset (NULL until the file is next synced)
+            add_column(conn, "sync_state", "last_offset", "INTEGER")
+        if version < 2:
+            # File stat snapshot used to skip unchanged files
+            add_column(conn, "sync_state", "mtime_ns", "INTEGER")
+            add_column(conn, "sync_state", "size", "INTEGER")
+        if "daily_totals" not in existing:
+            conn.execute("""
+                INSERT INTO daily_totals
+                SELECT date, COUNT(*),
+                       COALESCE(SUM(input_tokens), 0),
+                       COALESCE(SUM(output_tokens), 0),
+                       COALESCE(SUM(cache_read_tokens), 0),
+                       COALESCE(SUM(cache_creation_tokens), 0),
+                       COALESCE(SUM(total_tokens), 0)
+                FROM metrics GROUP BY date
+            """)
+
+    # Covering index: per-model range aggregates never touch the table pages.
+    # idx_metrics_model is dropped because the planner prefers it for
+    # GROUP BY model and then has to visit every table row; idx_metrics_date
+    # is a prefix of the covering index and only costs writes.
+    conn.execute("DROP INDEX IF EXISTS idx_metrics_model")
+    conn.execute("DROP INDEX IF EXISTS idx_metrics_date")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_metrics_cover ON metrics(
+            date, model, input_tokens, output_tokens,
+            cache_read_tokens, cache_creation_tokens, total_tokens
+        )
+    """)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.execute("COMMIT")
+
+
+def insert_rows(cursor, rows: list[tuple]):
+    """Insert metric rows and fold them into the daily_totals rollup."""
+    cursor.executemany(INSERT_METRICS_SQL, rows)
+
+    per_day: dict[str, list[int]] = {}
+    for _, date, _, inp, out, cr, cc, total, _ in rows:
+        day = per_day.setdefault(date, [date, 0, 0, 0, 0, 0, 0])
+        day[1] += 1
+        day[2] += inp
+        day[3] += out
+        day[4] += cr
+        day[5] += cc
+        day[6] += total
+    cursor.executemany(UPSERT_DAILY_TOTALS_SQL, list(per_day.values()))
 
 
-def normalize_model_name(raw: str | None) -> str | None:
-    """Normalize model identifiers to short canonical names.
+def scan_lines(buf, pos: int, fallback_date: str | None, rows: list) -> tuple[int, int]:
+    """Parse complete lines of `buf` from `pos` into rows.
 
-    e.g. 'us.anthropic.claude-opus-4-6-v1' -> 'opus-4-6'
-         'global.anthropic.claude-haiku-4-5-20251001-v1:0' -> 'haiku-4-5'
+    Returns (end position, line count); a trailing partial line is left
+    for the next sync.
     """
-    if not raw:
-        return None
-    for family in ("opus", "sonnet", "haiku"):
-        if family in raw.lower():
-            # Extract version digits after family name
-            # "claude-opus-4-6-v1" or "claude-opus-4-5-20251101-v1:0"
-            parts = raw.replace(".", "-").replace(":", "-").split("-")
-            try:
-                idx = next(i for i, p in enumerate(parts) if p == family)
-                version_parts = []
-                for p in parts[idx + 1:]:
-                    if p.isdigit() and len(p) <= 2:
-                        version_parts.append(p)
-                    else:
-                        break
-                if version_parts:
-                    return f"{family}-{'-'.join(version_parts)}"
-                return family
-            except StopIteration:
-                return family
-    return raw
-
-
-def parse_otel_metrics(data: dict, fallback_date: str = None) -> list[dict]:
-    """Parse OTEL metric data, returning one record per model."""
-    if not isinstance(data, dict):
-        return []
-    # Skip non-OTEL records (e.g. Vector HTTP server metadata)
-    if "resourceMetrics" not in data:
-        return []
-    # Skip empty/test payloads with no actual metrics
-    has_metrics = any(
-        scope.get("metrics")
-        for rm in data.get("resourceMetrics", [])
-        for scope in rm.get("scopeMetrics", [])
-    )
-    if not has_metrics:
-        return []
+    lines = 0
+    while True:
+        end = buf.find(b"\n", pos)
+        if end < 0:
+            return pos, lines
+        rows.extend(parse_line(buf[pos:end], fallback_date))
+        pos = end + 1
+        lines += 1
 
-    try:
-        latest_time_nano = 0
-        # Accumulate tokens per model
-        per_model: dict[str | None, dict] = {}
-
-        for rm in data.get("resourceMetrics", []):
-            for scope in rm.get("scopeMetrics", []):
-                for metric in scope.get("metrics", []):
-                    name = metric.get("name", "")
-                    data_points = metric.get("sum", {}).get("dataPoints", [])
-
-                    for dp in data_points:
-                        time_nano = int(dp.get("timeUnixNano", 0))
-                        if time_nano > latest_time_nano:
-                            latest_time_nano = time_nano
-
-                    if name == "claude_code.token.usage":
-                        for dp in data_points:
-                            value = int(dp.get("asDouble", dp.get("asInt", 0)))
-                            attrs = {a["key"]: a.get("value", {}).get("stringValue")
-                                     for a in dp.get("attributes", [])}
-                            token_type = attrs.get("type", "")
-                            model = normalize_model_name(attrs.get("model"))
-
-                            if model not in per_model:
-                                per_model[model] = {
-                                    "input_tokens": 0, "output_tokens": 0,
-                                    "cache_read_tokens": 0, "cache_creation_tokens": 0,
-                                }
-                            bucket = per_model[model]
-                            if token_type == "input":
-                                bucket["input_tokens"] += value
-                            elif token_type == "output":
-                                bucket["output_tokens"] += value
-                            elif token_type == "cacheRead":
-                                bucket["cache_read_tokens"] += value
-                            elif token_type == "cacheCreation":
-                                bucket["cache_creation_tokens"] += value
-
-        # Determine timestamp
-        if latest_time_nano > 0:
-            ts = datetime.fromtimestamp(latest_time_nano / 1_000_000_000)
-            timestamp = ts.isoformat()
-            date = ts.strftime("%Y-%m-%d")
-        elif fallback_date:
-            timestamp = f"{fallback_date}T00:00:00"
-            date = fallback_date
+
+def parse_file(json_file: str, last_line: int, last_offset: int | None) -> tuple[list, int, int]:
+    """Parse lines appended to a JSONL file since the stored position.
+
+    Returns (rows, last_line, last_offset) for the file's new sync_state entry.
+    """
+    filename = Path(json_file).name
+    fallback_date = None
+    if filename.startswith("metrics-") and filename.endswith(".jsonl"):
+        fallback_date = filename[8:-6]
+
+    rows = []
+    with open(json_file, 'rb') as f:
+        if last_offset is None:
+            # Migration: older versions only recorded a line count
+            for _ in range(last_line):
+                if not f.readline():
+                    break
+            last_offset = f.tell()
+
+        size = os.fstat(f.fileno()).st_size
+        if size <= last_offset:
+            return rows, last_line, last_offset
+
+        if size - last_offset < MMAP_MIN_BYTES:
+            # Typical incremental tail: a single read() is cheaper than mapping
+            f.seek(last_offset)
+            consumed, lines = scan_lines(f.read(), 0, fallback_date, rows)
+            last_offset += consumed
         else:
-            timestamp = datetime.now().isoformat()
-            date = datetime.now().strftime("%Y-%m-%d")
-
-        # No token data (e.g. session.count, active_time payloads) — skip
-        if not per_model:
-            return []
-
-        results = []
-        for model, tokens in per_model.items():
-            total = tokens["input_tokens"] + tokens["output_tokens"] + \
-                    tokens["cache_read_tokens"] + tokens["cache_creation_tokens"]
-            results.append({
-                "timestamp": timestamp,
-                "date": date,
-                "model": model,
-                "input_tokens": tokens["input_tokens"],
-                "output_tokens": tokens["output_tokens"],
-                "cache_read_tokens": tokens["cache_read_tokens"],
-                "cache_creation_tokens": tokens["cache_creation_tokens"],
-                "total_tokens": total,
-            })
-        return results
-
-    except Exception as e:
-        print(f"Warning: Error parsing metric: {e}")
-        return []
+            # Large backlog: scan the mapped file with mm.find() instead of buffered I/O
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                last_offset, lines = scan_lines(mm, last_offset, fallback_date, rows)
+    return rows, last_line + lines, last_offset
+
+
+def scan_raw_dir() -> list[tuple[str, os.stat_result]]:
+    """(path, stat) of each raw/*.jsonl file, sorted by path, from one scandir."""
+    with os.scandir(RAW_DIR) as entries:
+        files = [
+            (entry.path, entry.stat()) for entry in entries
+            if entry.name.endswith(".jsonl") and not entry.name.startswith(".") and entry.is_file()
+        ]
+    files.sort()
+    return files
+
+
+def raw_dir_signature(files: list[tuple[str, os.stat_result]]) -> str:
+    """Summarize raw/*.jsonl as count, newest mtime and total size."""
+    newest = max((st.st_mtime_ns for _, st in files), default=0)
+    total_size = sum(st.st_size for _, st in files)
+    return f"{len(files)}:{newest}:{total_size}"
 
 
 def sync_json_to_db():
@@ -225,56 +333,64 @@ def sync_json_to_db():
     if not RAW_DIR.exists():
         return
 
-    conn = init_db()
+    json_files = scan_raw_dir()
+
+    # Nothing written since the last sync: skip the DB entirely
+    signature = raw_dir_signature(json_files)
+    try:
+        if DB_PATH.exists() and SYNC_MARKER_PATH.read_text() == signature:
+            return
+    except OSError:
+        pass
+
+    conn = get_conn()
     cursor = conn.cursor()
 
-    json_files = sorted(glob(str(RAW_DIR / "*.jsonl")))
     total_new = 0
 
-    for json_file in json_files:
-        filename = Path(json_file).name
-        fallback_date = None
-        if filename.startswith("metrics-") and filename.endswith(".jsonl"):
-            fallback_date = filename[8:-6]
-
-        cursor.execute("SELECT last_line FROM sync_state WHERE file_path = ?", (json_file,))
-        row = cursor.fetchone()
-        last_line = row[0] if row else 0
-
-        with open(json_file, 'r') as f:
-            lines = f.readlines()
-
-        new_lines = lines[last_line:]
-        if not new_lines:
-            continue
-
-        for line in new_lines:
-            try:
-                data = json.loads(line.strip())
-                records = parse_otel_metrics(data, fallback_date=fallback_date)
-                for parsed in records:
-                    cursor.execute("""
-                        INSERT INTO metrics (timestamp, date, model, input_tokens, output_tokens,
-                                             cache_read_tokens, cache_creation_tokens, total_tokens, raw_data)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        parsed["timestamp"], parsed["date"], parsed["model"],
-                        parsed["input_tokens"], parsed["output_tokens"],
-                        parsed["cache_read_tokens"], parsed["cache_creation_tokens"],
-                        parsed["total_tokens"], line.strip()
-                    ))
-                    total_new += 1
-            except json.JSONDecodeError:
-                continue
-
-        cursor.execute("""
-            INSERT OR REPLACE INTO sync_state (file_path, last_line, synced_at)
-            VALUES (?, ?, ?)
-        """, (json_file, len(lines), datetime.now().isoformat()))
-
-    conn.commit()
-    conn.close()
+    # Single explicit transaction for the whole sync (one commit, not one per row)
+    conn.execute("BEGIN IMMEDIATE")
+
+    cursor.execute(SELECT_SYNC_STATE_SQL)
+    sync_state = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    changed = []
+    for json_file, st in json_files:
+        last_line, last_offset, mtime_ns, size = sync_state.get(json_file, (0, 0, None, None))
+        if st.st_mtime_ns == mtime_ns and st.st_size == size:
+            continue  # unchanged since the last sync
+        changed.append((json_file, st, last_line, last_offset))
+
+    state_rows = []
+
+    def write(json_file, st, future):
+        rows, last_line, last_offset = future.result()
+        for start in range(0, len(rows), SYNC_BATCH_SIZE):
+            insert_rows(cursor, rows[start:start + SYNC_BATCH_SIZE])
+        state_rows.append((
+            json_file, last_line, last_offset, st.st_mtime_ns, st.st_size,
+            datetime.now().isoformat(),
+        ))
+        return len(rows)
+
+    # Worker threads parse files; this thread is the only SQLite writer.
+    # At most SYNC_WORKERS parsed files wait in memory at any time.
+    with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as pool:
+        pending = deque()
+        for json_file, st, last_line, last_offset in changed:
+            pending.append((json_file, st, pool.submit(parse_file, json_file, last_line, last_offset)))
+            if len(pending) > SYNC_WORKERS:
+                total_new += write(*pending.popleft())
+        while pending:
+            total_new += write(*pending.popleft())
+
+    cursor.executemany(UPSERT_SYNC_STATE_SQL, state_rows)
+    conn.execute("COMMIT")
+    SYNC_MARKER_PATH.write_text(signature)
     if total_new > 0:
+        # Refresh planner statistics (sampled, so cost stays bounded)
+        conn.execute("PRAGMA analysis_limit=400")
+        conn.execute("ANALYZE")
         console.print(f"[dim]Synced {total_new} new records.[/dim]")
 
 
@@ -307,30 +423,44 @@ def get_stats(conn, days: int, label: str) -> dict:
     """Get usage statistics for the specified period."""
     cursor = conn.cursor()
     start_date = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    prev_start = (datetime.now() - timedelta(days=2 * days - 1)).strftime("%Y-%m-%d")
 
-    # Overall totals
-    cursor.execute("""
-        SELECT
-            COUNT(*) as request_count,
-            COALESCE(SUM(input_tokens), 0),
-            COALESCE(SUM(output_tokens), 0),
-            COALESCE(SUM(cache_read_tokens), 0),
-            COALESCE(SUM(cache_creation_tokens), 0),
-            COALESCE(SUM(total_tokens), 0)
-        FROM metrics WHERE date >= ?
-    """, (start_date,))
-    row = cursor.fetchone()
-
-    # Per-model breakdown
+    # One pass over the rollup covers the period and the one before it;
+    # overall, daily and previous-period totals are split out below
     cursor.execute("""
-        SELECT model,
-               COUNT(*),
-               COALESCE(SUM(input_tokens), 0),
-               COALESCE(SUM(output_tokens), 0),
-               COALESCE(SUM(cache_read_tokens), 0),
-               COALESCE(SUM(cache_creation_tokens), 0)
-        FROM metrics WHERE date >= ?
-        GROUP BY model ORDER BY SUM(total_tokens) DESC
+        SELECT date, request_count, input_tokens, output_tokens,
+               cache_read_tokens, cache_creation_tokens, total_tokens
+        FROM daily_totals WHERE date >= ?
+        ORDER BY date DESC
+    """, (prev_start,))
+    daily = []
+    row = [0] * 6
+    prev = [0] * 5
+    for date, *totals in cursor.fetchall():
+        if date >= start_date:
+            daily.append((date, *totals[:5]))
+            row = [a + b for a, b in zip(row, totals)]
+        else:
+            prev = [a + b for a, b in zip(prev, totals)]
+
+    # Per-model breakdown with cost, share of total cost and the total itself
+    cursor.execute(f"""
+        SELECT model, reqs, inp, out, cr, cc, cost,
+               COALESCE(cost * 100.0 / NULLIF(SUM(cost) OVER (), 0), 0),
+               SUM(cost) OVER ()
+        FROM (
+            SELECT model,
+                   COUNT(*) AS reqs,
+                   COALESCE(SUM(input_tokens), 0) AS inp,
+                   COALESCE(SUM(output_tokens), 0) AS out,
+                   COALESCE(SUM(cache_read_tokens), 0) AS cr,
+                   COALESCE(SUM(cache_creation_tokens), 0) AS cc,
+                   {MODEL_COST_SQL} AS cost,
+                   SUM(total_tokens) AS total
+            FROM metrics WHERE date >= ?
+            GROUP BY model
+        )
+        ORDER BY total DESC
     """, (start_date,))
     by_model = cursor.fetchall()
 
@@ -342,31 +472,6 @@ def get_stats(conn, days: int, label: str) -> dict:
     """, (start_date,))
     by_hour = cursor.fetchall()
 
-    # Daily breakdown
-    cursor.execute("""
-        SELECT date, COUNT(*),
-               COALESCE(SUM(input_tokens), 0),
-               COALESCE(SUM(output_tokens), 0),
-               COALESCE(SUM(cache_read_tokens), 0),
-               COALESCE(SUM(cache_creation_tokens), 0)
-        FROM metrics WHERE date >= ?
-        GROUP BY date ORDER BY date DESC
-    """, (start_date,))
-    daily = cursor.fetchall()
-
-    # Previous period for trend comparison
-    prev_start = (datetime.now() - timedelta(days=2 * days - 1)).strftime("%Y-%m-%d")
-    prev_end = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-    cursor.execute("""
-        SELECT COUNT(*),
-               COALESCE(SUM(input_tokens), 0),
-               COALESCE(SUM(output_tokens), 0),
-               COALESCE(SUM(cache_read_tokens), 0),
-               COALESCE(SUM(cache_creation_tokens), 0)
-        FROM metrics WHERE date >= ? AND date <= ?
-    """, (prev_start, prev_end))
-    prev = cursor.fetchone()
-
     return {
         "period": label,
         "request_count": row[0],
@@ -412,10 +517,8 @@ def print_stats(stats: dict):
         console.print("\n  [dim]No data for this period.[/dim]\n")
         return
 
-    # Compute total cost (model-aware)
-    total_cost = 0.0
-    for model, reqs, inp, out, cr, cc in stats["by_model"]:
-        total_cost += compute_cost(inp, out, cr, cc, model)
+    # Total cost (model-aware, priced in SQL)
+    total_cost = stats["by_model"][0][-1] if stats["by_model"] else 0.0
 
     # Previous period cost
     prev_cost = compute_cost(
@@ -448,11 +551,8 @@ def print_stats(stats: dict):
         table.add_column("Cost", justify="right", style="yellow", no_wrap=True)
         table.add_column("Share", justify="left", no_wrap=True)
 
-        for model, reqs, inp, out, cr, cc in stats["by_model"]:
-            cost = compute_cost(inp, out, cr, cc, model)
-            share_pct = (cost / total_cost * 100) if total_cost > 0 else 0
-            bar_len = int(share_pct / 100 * 12)
-            bar = "█" * bar_len + "░" * (12 - bar_len)
+        for model, reqs, inp, out, cr, cc, cost, share_pct, _ in stats["by_model"]:
+            bar = SHARE_BARS[int(share_pct / 100 * 12)]
 
             table.add_row(
                 get_model_display_name(model),
@@ -472,8 +572,7 @@ def print_stats(stats: dict):
         console.print("  [bold]Peak Hours[/bold]")
         max_count = max(count for _, count in stats["by_hour"])
         for hour, count in stats["by_hour"]:
-            bar_len = int(count / max_count * 24) if max_count > 0 else 0
-            bar = "█" * bar_len
+            bar = HOUR_BARS[int(count / max_count * 24) if max_count > 0 else 0]
             console.print(f"  [dim]{hour:02d}[/dim] {bar} {count}")
 
     # Daily breakdown
@@ -495,6 +594,19 @@ def print_stats(stats: dict):
     console.print()
 
 
+def count_lines(path: Path) -> int:
+    """Count lines in a file by scanning 1 MiB binary chunks for newlines."""
+    lines = 0
+    buf = b""
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(1 << 20), b""):
+            lines += buf.count(b"\n")
+    # An unterminated last line still counts
+    if buf and not buf.endswith(b"\n"):
+        lines += 1
+    return lines
+
+
 def check_forwarding_status():
     """Check if there are any failed forwards."""
     console.print()
@@ -510,17 +622,42 @@ def check_forwarding_status():
     else:
         total_failed = 0
         for f in failed_files:
-            with open(f, 'r') as fp:
-                lines = len(fp.readlines())
-                total_failed += lines
-                console.print(f"  [red]![/red] {f.name}: {lines} failed records")
+            lines = count_lines(f)
+            total_failed += lines
+            console.print(f"  [red]![/red] {f.name}: {lines} failed records")
         console.print(f"\n  Total failed: [bold red]{total_failed}[/bold red] records\n")
 
 
+def wait_for_writes(f):
+    """Yield each time the open file may have grown.
+
+    Blocks on kqueue where available (macOS), otherwise polls once a second.
+    """
+    import select
+
+    if not hasattr(select, "kqueue"):
+        import time
+        while True:
+            time.sleep(1)
+            yield
+
+    kq = select.kqueue()
+    try:
+        kq.control([select.kevent(
+            f.fileno(),
+            filter=select.KQ_FILTER_VNODE,
+            flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+            fflags=select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND,
+        )], 0)
+        while True:
+            kq.control(None, 1)
+            yield
+    finally:
+        kq.close()
+
+
 def tail_logs():
     """Show recent metrics in real-time."""
-    import time
-
     console.print("[dim]Watching for new metrics (Ctrl+C to stop)...[/dim]")
 
     today = datetime.now().strftime("%Y-%m-%d")
@@ -530,19 +667,19 @@ def tail_logs():
         console.print(f"[yellow]No log file yet for today:[/yellow] {log_file}")
         return
 
-    with open(log_file, 'r') as f:
+    with open(log_file, 'rb') as f:
         f.seek(0, 2)  # Go to end
-        while True:
-            line = f.readline()
-            if line:
+        pending = b""
+        for _ in wait_for_writes(f):
+            # Only bytes appended since the last wakeup; keep any partial line
+            *lines, pending = (pending + f.read()).split(b"\n")
+            for line in lines:
                 try:
-                    json.loads(line)
+                    json_loads(line)
                     ts = datetime.now().strftime("%H:%M:%S")
                     console.print(f"[dim]{ts}[/dim] New metric received")
                 except Exception:
                     pass
-            else:
-                time.sleep(1)
 
 
 def main():
@@ -552,25 +689,22 @@ def main():
     if command != "tail":
         sync_json_to_db()
 
-    conn = init_db()
-
-    try:
-        if command in ("today", ""):
-            print_stats(get_stats(conn, days=1, label="Today"))
-        elif command == "week":
-            print_stats(get_stats(conn, days=7, label="This Week"))
-        elif command == "month":
-            print_stats(get_stats(conn, days=30, label="This Month"))
-        elif command == "sync":
-            console.print("[green]Sync complete.[/green]")
-        elif command == "check":
-            check_forwarding_status()
-        elif command == "tail":
-            tail_logs()
-        else:
-            print(__doc__)
-    finally:
-        conn.close()
+    conn = get_conn()
+
+    if command in ("today", ""):
+        print_stats(get_stats(conn, days=1, label="Today"))
+    elif command == "week":
+        print_stats(get_stats(conn, days=7, label="This Week"))
+    elif command == "month":
+        print_stats(get_stats(conn, days=30, label="This Month"))
+    elif command == "sync":
+        console.print("[green]Sync complete.[/green]")
+    elif command == "check":
+        check_forwarding_status()
+    elif command == "tail":
+        tail_logs()
+    else:
+        print(__doc__)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+"""
+CC-Insights: OTEL metric parsing core
+
+Pure, fully annotated parsing functions used by the sync loop in stats.py.
+Kept free of I/O and SQLite so the module can be compiled with mypyc:
+
+    cd scripts && mypyc stats_core.py
+
+When no compiled extension is present the plain Python module is imported.
+"""
+
+import re
+import zlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # stdlib fallback when running outside the uv environment
+    from json import loads as json_loads  # type: ignore[assignment]
+
+TOKEN_USAGE_METRIC = "claude_code.token.usage"
+TOKEN_USAGE_METRIC_BYTES = TOKEN_USAGE_METRIC.encode()
+
+# OTEL token "type" attribute -> metrics column
+TOKEN_TYPE_COLUMNS: dict[str, str] = {
+    "input": "input_tokens",
+    "output": "output_tokens",
+    "cacheRead": "cache_read_tokens",
+    "cacheCreation": "cache_creation_tokens",
+}
+
+
+MODEL_FAMILIES = ("opus", "sonnet", "haiku")
+
+# Family as a whole '-', '.' or ':' separated part, then its 1-2 digit
+# version parts; group 1 is the version suffix, e.g. "-4-6" or ".4.5"
+MODEL_VERSION_RE: dict[str, re.Pattern[str]] = {
+    family: re.compile(rf"(?:^|[-.:]){family}((?:[-.:]\d{{1,2}}(?![^-.:]))*)(?![^-.:])")
+    for family in MODEL_FAMILIES
+}
+VERSION_SEPARATORS = str.maketrans(".:", "--")
+
+
+@lru_cache(maxsize=256)
+def normalize_model_name(raw: str | None) -> str | None:
+    """Normalize model identifiers to short canonical names.
+
+    e.g. 'us.anthropic.claude-opus-4-6-v1' -> 'opus-4-6'
+         'global.anthropic.claude-haiku-4-5-20251001-v1:0' -> 'haiku-4-5'
+    """
+    if not raw:
+        return None
+    lowered = raw.lower()
+    for family in MODEL_FAMILIES:
+        if family in lowered:
+            match = MODEL_VERSION_RE[family].search(raw)
+            if match:
+                return family + match.group(1).translate(VERSION_SEPARATORS)
+            return family
+    return raw
+
+
+@lru_cache(maxsize=1024)
+def local_quarter_hour(quarter: int) -> datetime:
+    """Local time at the start of a 15-minute epoch slot.
+
+    UTC offsets and DST transitions all fall on 15-minute boundaries, so the
+    local time of any instant is this value plus the seconds into the slot.
+    """
+    return datetime.fromtimestamp(quarter * 900)
+
+
+def token_attributes(attributes: list[Any]) -> tuple[str | None, str | None]:
+    """Return the (type, model) attribute values of a token usage data point."""
+    token_type = model = None
+    for attr in attributes:
+        key = attr.get("key")
+        if key == "type":
+            token_type = attr.get("value", {}).get("stringValue")
+        elif key == "model":
+            model = attr.get("value", {}).get("stringValue")
+    return token_type, model
+
+
+def parse_otel_metrics(data: Any, fallback_date: str | None = None) -> list[dict[str, Any]]:
+    """Parse OTEL metric data, returning one record per model."""
+    if not isinstance(data, dict):
+        return []
+    # Skip non-OTEL records (e.g. Vector HTTP server metadata)
+    if "resourceMetrics" not in data:
+        return []
+    # Skip empty/test payloads with no actual metrics
+    has_metrics = any(
+        scope.get("metrics")
+        for rm in data.get("resourceMetrics", [])
+        for scope in rm.get("scopeMetrics", [])
+    )
+    if not has_metrics:
+        return []
+
+    try:
+        latest_time_nano = 0
+        # Accumulate tokens per model
+        per_model: dict[str | None, dict[str, int]] = {}
+
+        for rm in data.get("resourceMetrics", []):
+            for scope in rm.get("scopeMetrics", []):
+                for metric in scope.get("metrics", []):
+                    name = metric.get("name", "")
+                    data_points = metric.get("sum", {}).get("dataPoints", [])
+
+                    if name != TOKEN_USAGE_METRIC:
+                        # Other metrics only contribute their timestamps
+                        for dp in data_points:
+                            time_nano = int(dp.get("timeUnixNano", 0))
+                            if time_nano > latest_time_nano:
+                                latest_time_nano = time_nano
+                        continue
+
+                    for dp in data_points:
+                        time_nano = int(dp.get("timeUnixNano", 0))
+                        if time_nano > latest_time_nano:
+                            latest_time_nano = time_nano
+
+                        value = int(dp.get("asDouble", dp.get("asInt", 0)))
+                        token_type, raw_model = token_attributes(dp.get("attributes", []))
+                        model = normalize_model_name(raw_model)
+
+                        if model not in per_model:
+                            per_model[model] = {
+                                "input_tokens": 0, "output_tokens": 0,
+                                "cache_read_tokens": 0, "cache_creation_tokens": 0,
+                            }
+                        column = TOKEN_TYPE_COLUMNS.get(token_type or "")
+                        if column is not None:
+                            per_model[model][column] += value
+
+        # Determine timestamp
+        if latest_time_nano > 0:
+            seconds, nanos = divmod(latest_time_nano, 1_000_000_000)
+            quarter, offset = divmod(seconds, 900)
+            ts = local_quarter_hour(quarter) + timedelta(
+                seconds=offset, microseconds=(nanos + 500) // 1000)
+            timestamp = ts.isoformat()
+            date = timestamp[:10]
+        elif fallback_date:
+            timestamp = f"{fallback_date}T00:00:00"
+            date = fallback_date
+        else:
+            timestamp = datetime.now().isoformat()
+            date = timestamp[:10]
+
+        # No token data (e.g. session.count, active_time payloads) — skip
+        if not per_model:
+            return []
+
+        results: list[dict[str, Any]] = []
+        for model, tokens in per_model.items():
+            total = tokens["input_tokens"] + tokens["output_tokens"] + \
+                    tokens["cache_read_tokens"] + tokens["cache_creation_tokens"]
+            results.append({
+                "timestamp": timestamp,
+                "date": date,
+                "model": model,
+                "input_tokens": tokens["input_tokens"],
+                "output_tokens": tokens["output_tokens"],
+                "cache_read_tokens": tokens["cache_read_tokens"],
+                "cache_creation_tokens": tokens["cache_creation_tokens"],
+                "total_tokens": total,
+            })
+        return results
+
+    except Exception as e:
+        print(f"Warning: Error parsing metric: {e}")
+        return []
+
+
+def parse_line(line: bytes, fallback_date: str | None = None) -> list[tuple[Any, ...]]:
+    """Decode one JSONL line into metrics rows (empty for undecodable lines).
+
+    The raw payload is kept zlib-compressed; the JSONL file stays authoritative.
+    """
+    # Lines without token usage can never produce a row: skip them undecoded
+    if TOKEN_USAGE_METRIC_BYTES not in line:
+        return []
+    try:
+        data = json_loads(line)
+    except ValueError:
+        return []
+    records = parse_otel_metrics(data, fallback_date=fallback_date)
+    if not records:
+        return []
+    raw_data = zlib.compress(line.strip(), 1)
+    return [
+        (
+            parsed["timestamp"], parsed["date"], parsed["model"],
+            parsed["input_tokens"], parsed["output_tokens"],
+            parsed["cache_read_tokens"], parsed["cache_creation_tokens"],
+            parsed["total_tokens"], raw_data,
+        )
+        for parsed in records
+    ]